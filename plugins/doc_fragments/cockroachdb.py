@@ -74,6 +74,11 @@ options:
 notes:
   - This module uses C(psycopg2), a Python PostgreSQL database driver.
     Be ensure the driver is installed on the target host before using this module.
+  - Every task runs the module in a separate process on the target host,
+    so a new connection is established each time, including the TLS handshake
+    when SSL is used. To reduce the number of connections, prefer running
+    several statements in one task, for example, using the I(batch_args) option
+    of M(community.cockroachdb.cockroachdb_query), over running a task per statement.
 
 requirements:
   - psycopg2
@@ -10,10 +10,13 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import atexit
+
 psycopg2 = None
 try:
     import psycopg2
     from psycopg2.extras import DictCursor
+    from psycopg2.pool import ThreadedConnectionPool
     HAS_PSYCOPG2 = True
 except ImportError:
     HAS_PSYCOPG2 = False
@@ -23,6 +26,32 @@ from ansible.module_utils._text import to_native
 from ansible.module_utils.six import iteritems
 from ansible_collections.community.cockroachdb.plugins.module_utils.version import LooseVersion
 
+# Maximum number of connections a single pool can hold
+POOL_MAX_CONN = 8
+
+# Name the server shows for sessions opened by the modules,
+# for example, in the output of SHOW SESSIONS
+APPLICATION_NAME = 'ansible-community.cockroachdb'
+
+# Connection pools shared by all CockroachDBServer objects
+# within the process, keyed by get_pool_key()
+_POOLS = {}
+
+
+def close_pools():
+    """Close connections of all pools created within the process.
+
+    Registered to run at exit, so the sessions are ended
+    cleanly instead of relying on interpreter teardown.
+    """
+    for pool in _POOLS.values():
+        if not pool.closed:
+            pool.closeall()
+    _POOLS.clear()
+
+
+atexit.register(close_pools)
+
 
 def common_argument_spec():
     """
@@ -74,12 +103,13 @@ class CockroachDBServer():
     def __init__(self, module):
         self.module = module
         self.connection = None
+        self.pool = None
         ensure_required_libs(self.module)
 
     def connect(self, conn_params, autocommit=False, fail_on_conn=True, rows_type='dict'):
         """Connect to a CockroachDB database.
 
-        Return psycopg2 connection object.
+        Return psycopg2 connection object taken from a connection pool.
 
         Args:
             conn_params (dict) -- dictionary with connection parameters
@@ -95,13 +125,26 @@ class CockroachDBServer():
         else:
             cursor_factory = None
 
+        # The application name is a connection parameter,
+        # so it is set on every connection and is a part of the pool key
+        if 'application_name' not in conn_params:
+            conn_params = dict(conn_params, application_name=APPLICATION_NAME)
+
         try:
-            self.connection = psycopg2.connect(cursor_factory=cursor_factory, **conn_params)
-            if autocommit:
-                if LooseVersion(psycopg2.__version__) >= LooseVersion('2.4.2'):
-                    self.connection.set_session(autocommit=True)
-                else:
-                    self.connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            key = get_pool_key(conn_params, rows_type)
+            if key not in _POOLS:
+                _POOLS[key] = ThreadedConnectionPool(1, POOL_MAX_CONN,
+                                                     cursor_factory=cursor_factory,
+                                                     **conn_params)
+            self.pool = _POOLS[key]
+            self.connection = self.pool.getconn()
+
+            # Connections are reused, so the session
+            # characteristics must be set on every checkout
+            if LooseVersion(psycopg2.__version__) >= LooseVersion('2.4.2'):
+                self.connection.set_session(autocommit=autocommit)
+            elif autocommit:
+                self.connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
 
         except Exception as e:
             if fail_on_conn:
@@ -112,6 +155,30 @@ class CockroachDBServer():
 
         return self.connection
 
+    def close(self):
+        """Return the connection to the pool it was taken from.
+
+        The pool closes its connections when the process exits, see close_pools().
+        """
+        if self.connection is not None:
+            self.pool.putconn(self.connection)
+            self.connection = None
+
+
+def get_pool_key(conn_params, rows_type):
+    """Get a key identifying a connection pool.
+
+    Connections can only be shared between callers
+    passing the same connection parameters and rows type.
+
+    Returns a tuple.
+
+    Args:
+        conn_params (dict) -- dictionary with connection parameters
+        rows_type (str) -- specifies rows of which type to return
+    """
+    return (rows_type,) + tuple(sorted(iteritems(conn_params)))
+
 
 def get_params_map():
     """Get params map for mapping collection-related module options
@@ -34,7 +34,9 @@ options:
     choices: [absent, present]
     default: present
   owner:
-    description: Database owner.
+    description:
+      - Database owner.
+      - The name is case-insensitive, the server stores user names in lowercase.
     type: str
 '''
 
@@ -68,6 +70,13 @@ EXAMPLES = r'''
 
 RETURN = r'''#'''
 
+try:
+    from psycopg2 import sql
+except ImportError:
+    # psycopg2 availability will be checked
+    # when instantiating CockroachDBServer in main()
+    pass
+
 from ansible.module_utils.basic import AnsibleModule
 
 from ansible_collections.community.cockroachdb.plugins.module_utils.cockroachdb import (
@@ -76,8 +85,6 @@ from ansible_collections.community.cockroachdb.plugins.module_utils.cockroachdb
     get_conn_params,
 )
 
-executed_statements = []
-
 
 class CockroachDBDatabase():
     def __init__(self, module, cursor, name):
@@ -90,45 +97,58 @@ class CockroachDBDatabase():
         self.regions = []
         self.survive_failure = None
         self.owner = None
+        self.executed_statements = []
         # Update the above by fetching
         # the info from the database
         self.__fetch_info()
 
     def __fetch_info(self):
-        self.cursor.execute('SHOW DATABASES')
-        res = self.cursor.fetchall()
-        for d in res:
-            if d['database_name'] == self.name:
-                self.exists = True
-                self.owner = d['owner']
-                self.primary_region = d['primary_region']
-                self.regions = d['regions']
-                self.survive_failure = d['survival_goal']
+        # Let the server filter the output of SHOW DATABASES,
+        # so only the row of the database we need is returned
+        query = ('SELECT owner, primary_region, regions, survival_goal '
+                 'FROM [SHOW DATABASES] WHERE database_name = %s')
+        self.cursor.execute(query, (self.name,))
+        d = self.cursor.fetchone()
+        if d:
+            self.exists = True
+            self.owner = d['owner']
+            self.primary_region = d['primary_region']
+            self.regions = d['regions']
+            self.survive_failure = d['survival_goal']
 
     def create(self):
         if self.module.check_mode:
             return
 
-        query = 'CREATE DATABASE "%s"' % self.name
+        stmt = sql.SQL('CREATE DATABASE {}').format(sql.Identifier(self.name))
         if self.module.params['owner']:
-            query += 'OWNER %s' % (self.module.params['owner'])
-        
+            # The name is quoted, so lowercase it the way the server does
+            owner = self.module.params['owner'].lower()
+            stmt = sql.SQL('{} OWNER {}').format(stmt, sql.Identifier(owner))
+
+        query = stmt.as_string(self.cursor)
         self.cursor.execute(query)
-        executed_statements.append((query, ()))
+        self.executed_statements.append((query, ()))
 
     def drop(self):
         if self.module.check_mode:
             return True
 
-        query = 'DROP DATABASE "%s"' % self.name
+        query = sql.SQL('DROP DATABASE {}').format(sql.Identifier(self.name)).as_string(self.cursor)
         self.cursor.execute(query)
-        executed_statements.append((query, ()))
+        self.executed_statements.append((query, ()))
 
     def modify(self, owner, target):
         changed = False
 
-        # Change owner
+        # Change owner if it differs from the current one
+        # fetched by __fetch_info, so nothing is executed
+        # when the database is already owned by the passed user.
+        # The server stores user names in lowercase
         if owner:
+            owner = owner.lower()
+
+        if owner and owner != self.owner:
             if self.module.check_mode:
                 return True
             self.__change_owner(owner)
@@ -137,9 +157,10 @@ class CockroachDBDatabase():
         return changed
 
     def __change_owner(self, new_owner):
-        query = 'ALTER DATABASE "%s" OWNER TO %s' % (self.name, new_owner)
+        query = sql.SQL('ALTER DATABASE {} OWNER TO {}').format(
+            sql.Identifier(self.name), sql.Identifier(new_owner)).as_string(self.cursor)
         self.cursor.execute(query)
-        executed_statements.append((query, ()))
+        self.executed_statements.append((query, ()))
 
 
 def main():
@@ -198,14 +219,14 @@ def main():
             database.drop()
             changed = True
 
-    # Close cursor and conn
+    # Close cursor and return conn to the pool
     cursor.close()
-    conn.close()
+    cockroachdb.close()
 
     # Users will get this in JSON output after execution
     kw = dict(
         changed=changed,
-        executed_statements=executed_statements,
+        executed_statements=database.executed_statements,
     )
 
     # Return values and exit
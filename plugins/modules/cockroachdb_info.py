@@ -219,9 +219,9 @@ def main():
     server_info['regions'] = get_info(module, cursor, 'SHOW REGIONS FROM CLUSTER',
                                       'region', ['zones'])
 
-    # Close cursor and conn
+    # Close cursor and return conn to the pool
     cursor.close()
-    conn.close()
+    cockroachdb.close()
 
     module.exit_json(changed=False, **server_info)
 
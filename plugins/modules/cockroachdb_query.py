@@ -37,24 +37,76 @@ options:
   positional_args:
     description:
       - List of values to be passed as positional arguments to the query.
-      - Mutually exclusive with I(named_args).
+      - Mutually exclusive with I(named_args) and I(batch_args).
     type: list
     elements: raw
 
   named_args:
     description:
       - Dictionary of key-value arguments to pass to the query.
-      - Mutually exclusive with I(positional_args).
+      - Mutually exclusive with I(positional_args) and I(batch_args).
     type: dict
 
+  batch_args:
+    description:
+      - List of lists of positional arguments or list of dictionaries of named arguments.
+      - The query is executed once for each element of the list.
+        The statements are sent to the server in pages of 1000 to reduce the number of round-trips.
+      - When used, the I(statusmessage), I(rowcount) and I(query_result) return values
+        relate to the last executed statement and the I(query) return value contains
+        the query without substituted arguments.
+      - Mutually exclusive with I(positional_args) and I(named_args).
+    type: list
+    elements: raw
+    version_added: '0.4.0'
+
   rows_type:
     description:
       - If set to C(tuple), rows in the I(query_result)
         return value will be of the tuple type.
       - Returns dictionaries by default.
+      - Is ignored when I(output_format=csv).
     type: str
     choices: [dict, tuple]
     default: dict
+
+  output_format:
+    description:
+      - If set to C(csv), the I(query_result) return value will be a string
+        containing the rows returned by the query in CSV format with a header line.
+      - The rows are exported by the C(COPY (query) TO STDOUT) statement,
+        so the query must be of a kind C(COPY) accepts, for example, C(SELECT).
+        Requires CockroachDB 22.2 or later.
+      - Using C(csv) is faster and takes less memory than the default for large result sets.
+      - Cannot be used with I(batch_args).
+    type: str
+    choices: [rows, csv]
+    default: rows
+    version_added: '0.4.0'
+
+  return_mogrified:
+    description:
+      - If C(true), the I(query) return value contains the executed query with substituted arguments.
+      - If C(false), the I(query) return value contains the query as it was passed,
+        which avoids returning large arguments twice, for example, in the I(query)
+        return value and in the task invocation.
+    type: bool
+    default: true
+    version_added: '0.4.0'
+
+  cache_ttl:
+    description:
+      - Number of seconds to cache the result of a C(SELECT) query on the target host.
+      - While the cached result is not expired, it is returned without connecting to the database
+        if the module is invoked with the same query, arguments, connection options and I(rows_type).
+      - The results are stored in files readable only by the user running the module
+        in a per-user directory within C(/dev/shm) or the system temporary directory if it is absent.
+      - Expired results are removed when they are read, and only 100 most recent results are kept.
+      - Is not used when I(batch_args) is passed.
+      - If C(0), the result is not cached.
+    type: int
+    default: 0
+    version_added: '0.4.0'
 '''
 
 EXAMPLES = r'''
@@ -97,12 +149,37 @@ EXAMPLES = r'''
     named_args:
       id_val: 1
       story_val: test
+
+- name: Insert several rows in test_db executing the query for each list of args
+  community.cockroachdb.cockroachdb_query:
+    login_db: test_db
+    query: INSERT INTO test (id, story) VALUES (%s, %s)
+    batch_args:
+    - [1, first]
+    - [2, second]
+    - [3, third]
+
+- name: Run select query caching its result for 10 minutes
+  community.cockroachdb.cockroachdb_query:
+    login_db: acme
+    query: SELECT * FROM acme WHERE id = %s
+    positional_args:
+    - 1
+    cache_ttl: 600
+
+- name: Export rows of the acme table in CSV format
+  community.cockroachdb.cockroachdb_query:
+    login_db: acme
+    query: SELECT * FROM acme
+    output_format: csv
+  register: result
 '''
 
 RETURN = r'''
 query:
     description:
     - Executed query containing substituted arguments.
+    - When I(return_mogrified=false), the query as it was passed.
     returned: always
     type: str
     sample: 'SELECT * FROM bar'
@@ -118,9 +195,10 @@ query_result:
   description:
     - List of dicts representing returned rows.
       When the I(rows_type) option is set to C(tuple), it will consist of tuples.
+    - When the I(output_format) option is set to C(csv), it is a string
+      containing the rows in CSV format.
   returned: always
-  type: list
-  elements: dict
+  type: raw
   sample: [{"version": "CockroachDB CCL v21.1.6 (x86_64-unknown-linux-gnu, built 2021/07/20 15:30:39, go1.15.11)"}]
 
 rowcount:
@@ -133,17 +211,32 @@ rowcount:
 
 import datetime
 import decimal
+import errno
+import hashlib
+import io
+import json
+import os
+import stat
+import tempfile
+import time
+
+from contextlib import closing
 
 try:
-    from psycopg2 import ProgrammingError as Psycopg2ProgrammingError
+    from psycopg2.extensions import DECIMAL, INTERVAL
+    from psycopg2.extras import execute_batch
+
+    # OIDs of the types which values are returned by psycopg2
+    # as decimal.Decimal and datetime.timedelta, taken from its typecasters
+    OIDS_NEED_TO_CONVERT = frozenset(DECIMAL.values + INTERVAL.values)
 except ImportError:
-    # it is needed for checking 'no result to fetch' in main(),
-    # psycopg2 availability will be checked by connect_to_db() into
-    # ansible.module_utils.postgres
-    pass
+    # it is needed for executing queries with batch_args in execute()
+    # and for converting fetched values, psycopg2 availability will be checked
+    # when instantiating CockroachDBServer in main()
+    OIDS_NEED_TO_CONVERT = frozenset()
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils._text import to_native
+from ansible.module_utils._text import to_bytes, to_native, to_text
 from ansible.module_utils.six import iteritems
 
 from ansible_collections.community.cockroachdb.plugins.module_utils.cockroachdb import (
@@ -152,7 +245,23 @@ from ansible_collections.community.cockroachdb.plugins.module_utils.cockroachdb
     get_conn_params,
 )
 
-TYPES_NEED_TO_CONVERT = (decimal.Decimal, datetime.timedelta)
+# Number of statements sent to the server at once
+# when executing a query with batch_args
+EXECUTE_PAGE_SIZE = 1000
+
+# Maximum number of cached query results kept on the host,
+# the oldest ones are removed when a new result is cached
+CACHE_MAX_ENTRIES = 100
+
+# Prefix of temporary files the results are written to before caching
+CACHE_TMP_PREFIX = '.tmp'
+
+# Functions converting values of the types
+# which are not supported by Ansible engine
+TYPE_CONVERTERS = {
+    decimal.Decimal: float,
+    datetime.timedelta: str,
+}
 
 
 def convert_to_supported(val):
@@ -163,15 +272,51 @@ def convert_to_supported(val):
 
     Returns value of appropriate type.
     """
-    if isinstance(val, decimal.Decimal):
-        return float(val)
-
-    if isinstance(val, datetime.timedelta):
-        return str(val)
+    # psycopg2 returns exact Decimal and timedelta instances,
+    # so a lookup by type() is enough and is not slower than isinstance()
+    converter = TYPE_CONVERTERS.get(type(val))
+    if converter is not None:
+        return converter(val)
 
     return val  # By default returns the same value
 
 
+def get_positions_to_convert(cursor):
+    """Get positions of the columns which values need conversion.
+
+    The column types are checked once per query based on cursor.description,
+    so values of the columns that do not need conversion are not inspected at all.
+
+    Args:
+        cursor (cursor): Cursor object of a database Python connector.
+
+    Returns a list of column indexes.
+    """
+    if cursor.description is None:
+        return []
+
+    return [i for i, col in enumerate(cursor.description)
+            if col.type_code in OIDS_NEED_TO_CONVERT]
+
+
+def get_row_converter(positions):
+    """Get a function converting values of a row at the passed positions.
+
+    Args:
+        positions (list) -- Column indexes returned by get_positions_to_convert().
+
+    Returns a function taking a row and returning a list of its values.
+    """
+    def convert_row(row):
+        row = list(row)
+        for i in positions:
+            row[i] = convert_to_supported(row[i])
+
+        return row
+
+    return convert_row
+
+
 def fetch_from_cursor_dict(cursor):
     """Fetch rows from cursor handling unsupported types.
 
@@ -180,18 +325,19 @@ def fetch_from_cursor_dict(cursor):
 
     Returns query_result list containing dictionaries.
     """
-    query_result = []
-    for row in cursor:
-        # Ansible engine does not support some types like decimals and timedelta.
-        # An explicit conversion is required on the module's side.
-        row = dict(row)
-        for key, val in iteritems(row):
-            if isinstance(val, TYPES_NEED_TO_CONVERT):
-                row[key] = convert_to_supported(val)
+    # Ansible engine does not support some types like decimals and timedelta.
+    # An explicit conversion is required on the module's side.
+    positions = get_positions_to_convert(cursor)
+    names = [col.name for col in cursor.description or ()]
 
-        query_result.append(row)
+    # Iterating over the cursor instead of calling cursor.fetchall()
+    # lets every fetched row be freed as soon as it has been converted
+    if not positions:
+        # Nothing to convert, take the rows as they are
+        return [dict(zip(names, row)) for row in cursor]
 
-    return query_result
+    convert_row = get_row_converter(positions)
+    return [dict(zip(names, convert_row(row))) for row in cursor]
 
 
 def fetch_from_cursor_tuple(cursor):
@@ -202,19 +348,175 @@ def fetch_from_cursor_tuple(cursor):
 
     Returns query_result list containing tuples.
     """
-    query_result = []
-    for row in cursor:
-        # Ansible engine does not support some types like decimals and timedelta.
-        # An explicit conversion is required on the module's side.
-        for i, val in enumerate(row):
-            if isinstance(val, TYPES_NEED_TO_CONVERT):
-                row = list(row)
-                row[i] = convert_to_supported(val)
-                row = tuple(row)
+    # Ansible engine does not support some types like decimals and timedelta.
+    # An explicit conversion is required on the module's side.
+    positions = get_positions_to_convert(cursor)
+
+    if not positions:
+        # Nothing to convert, take the rows as they are
+        return cursor.fetchall()
+
+    # Iterating over the cursor instead of calling cursor.fetchall()
+    # lets every fetched row be freed as soon as it has been converted
+    convert_row = get_row_converter(positions)
+    return [tuple(convert_row(row)) for row in cursor]
+
+
+def get_cache_dir():
+    """Get the directory to store cached query results in.
+
+    The directory is per-user, so the results cannot be read by other users.
+    /dev/shm is preferred as it is memory-backed.
+
+    Returns a path.
+    """
+    base_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base_dir, 'ansible_cockroachdb_cache_%s' % os.getuid())
+
+
+def get_cache_path(query, args, conn_params, rows_type, output_format='rows'):
+    """Get the path of the file to cache the query result in.
+
+    The name of the file is a hash of everything the result depends on.
+
+    Args:
+        query (str) -- Query to execute.
+        args (dict|list) -- Query parameters.
+        conn_params (dict) -- Dictionary with connection parameters.
+        rows_type (str) -- Type of rows in the result.
+
+    Kwargs:
+        output_format (str) -- Format of the result (default 'rows').
+
+    Returns a path.
+    """
+    key = repr((query.strip(), args, sorted(iteritems(conn_params)), rows_type, output_format))
+    return os.path.join(get_cache_dir(), hashlib.sha256(to_bytes(key)).hexdigest())
+
+
+def is_private_dir(path):
+    """Check the directory is owned by the current user and inaccessible to others.
+
+    Returns True or False.
+    """
+    st = os.lstat(path)
+    return (stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid()
+            and not st.st_mode & (stat.S_IRWXG | stat.S_IRWXO))
+
+
+def read_cache(path, ttl):
+    """Read a cached query result.
+
+    Args:
+        path (str) -- Path returned by get_cache_path().
+        ttl (int) -- Number of seconds the result stays valid.
+
+    Returns a dictionary with the result or None if there's no valid cached result.
+    """
+    try:
+        if not is_private_dir(os.path.dirname(path)):
+            return None
+
+        if time.time() - os.path.getmtime(path) >= ttl:
+            # Remove the expired result, so it doesn't stay on the host forever
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        with open(path) as f:
+            cached = json.load(f)
+
+    except (IOError, OSError, ValueError):
+        return None
+
+    # The file may be written by something else than write_cache()
+    if not isinstance(cached, dict):
+        return None
+
+    return cached
+
+
+def to_json_compatible(val):
+    """Convert a value json cannot serialize the same way module.exit_json() does.
+
+    Raises TypeError if the value cannot be converted.
+    """
+    if isinstance(val, (datetime.date, datetime.time)):
+        return val.isoformat()
+
+    raise TypeError('Object of type %s is not JSON serializable' % type(val).__name__)
+
+
+def prune_cache(cache_dir):
+    """Remove the oldest cached results if there are more than CACHE_MAX_ENTRIES of them.
+
+    Temporary files being written by other module invocations are skipped.
+
+    Args:
+        cache_dir (str) -- Directory returned by get_cache_dir().
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.startswith(CACHE_TMP_PREFIX):
+            continue
+
+        entry_path = os.path.join(cache_dir, name)
+        try:
+            entries.append((os.path.getmtime(entry_path), entry_path))
+        except OSError:
+            # Removed by another module invocation
+            pass
+
+    entries.sort(reverse=True)
+    for dummy, entry_path in entries[CACHE_MAX_ENTRIES:]:
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+
+
+def write_cache(module, path, result):
+    """Write a query result to the cache.
+
+    Failing to write the result is not fatal, the module just warns a user.
+
+    Args:
+        module (AnsibleModule) -- Object of ansible.module_utils.basic.AnsibleModule class.
+        path (str) -- Path returned by get_cache_path().
+        result (dict) -- Result to cache.
+    """
+    cache_dir = os.path.dirname(path)
+    try:
+        # Another module invocation can create the directory at the same time
+        try:
+            os.mkdir(cache_dir, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        if not is_private_dir(cache_dir):
+            module.warn('Cannot cache query result: %s is accessible to other users' % cache_dir)
+            return
+
+        # Write to a temporary file first, so other
+        # module invocations never read a partial result.
+        # The JSON is streamed to the file instead of building
+        # another in-memory copy of the result as a string
+        fd, tmp_path = tempfile.mkstemp(prefix=CACHE_TMP_PREFIX, dir=cache_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(result, f, default=to_json_compatible)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
 
-        query_result.append(row)
+        prune_cache(cache_dir)
 
-    return query_result
+    except (IOError, OSError, TypeError, ValueError) as e:
+        module.warn('Cannot cache query result: %s' % to_native(e))
 
 
 def get_args(positional_args, named_args):
@@ -232,7 +534,7 @@ def get_args(positional_args, named_args):
         return None
 
 
-def execute(module, cursor, query, args, fetch_from_cursor):
+def execute(module, cursor, query, args, fetch_from_cursor, batch=False):
     """Execute query in CockroachDB database.
 
     Args:
@@ -242,35 +544,89 @@ def execute(module, cursor, query, args, fetch_from_cursor):
         args (dict|tuple) -- Data structure to pass to cursor.execute as query parameters.
         fetch_from_cursor (function) -- Function to fetch rows from cursor.
 
+    Kwargs:
+        batch (bool) -- Execute the query for each element of args (default False).
+
     Returns a tuple (
         statusmessage (str) -- Status message returned by psycopg2, for example, "SELECT 1".
         rowcount (int) -- Number of rows fetched, for example, 1.
+        executed_query (bytes|str) -- Executed query containing substituted arguments,
+            or the query as passed (str) when batch is True.
         query_result (list) -- List that contains lists [[col1_val, col2_val, ...], [...]].
     )
     """
     statusmessage = None
     rowcount = None
+    executed_query = None
     query_result = []
     try:
-        mogrified_query = cursor.mogrify(query, args)
-        cursor.execute(query, args)
+        if batch:
+            # Send the statements in pages instead
+            # of a round-trip for each element of args
+            execute_batch(cursor, query, args, page_size=EXECUTE_PAGE_SIZE)
+            executed_query = query
+        else:
+            cursor.execute(query, args)
+            # The query with substituted arguments is kept by psycopg2
+            # after executing, so there's no need to call cursor.mogrify()
+            executed_query = cursor.query
         statusmessage = cursor.statusmessage
         rowcount = cursor.rowcount
 
-        try:
-            query_result = fetch_from_cursor(cursor)
-
-        except Psycopg2ProgrammingError as e:
-            if to_native(e) == 'no results to fetch':
-                pass
+        # cursor.description is None when the query
+        # returns no rows, e.g. INSERT without RETURNING,
+        # so there's nothing to fetch
+        if cursor.description is not None:
+            try:
+                query_result = fetch_from_cursor(cursor)
 
-        except Exception as e:
-            module.fail_json(msg='Cannot fetch rows from cursor: %s' % to_native(e))
+            except Exception as e:
+                module.fail_json(msg='Cannot fetch rows from cursor: %s' % to_native(e))
 
     except Exception as e:
         module.fail_json(msg='Cannot execute query "%s": %s' % (query, to_native(e)))
 
-    return statusmessage, rowcount, mogrified_query, query_result
+    return statusmessage, rowcount, executed_query, query_result
+
+
+def execute_copy(module, cursor, query, args):
+    """Export rows returned by a query in CSV format.
+
+    The rows are written by the server as CSV and are not
+    converted to Python objects, which is much cheaper for large result sets.
+
+    Args:
+        module (AnsibleModule) -- Object of ansible.module_utils.basic.AnsibleModule class.
+        cursor (cursor): Cursor object of a database Python connector.
+        query (str) -- Query to execute.
+        args (dict|tuple) -- Data structure to substitute query parameters with.
+
+    Returns a tuple (
+        statusmessage (str) -- Status message returned by psycopg2, for example, "COPY 1".
+        rowcount (int) -- Number of rows exported, for example, 1.
+        executed_query (bytes) -- Query containing substituted arguments.
+        query_result (str) -- Rows in CSV format.
+    )
+    """
+    statusmessage = None
+    rowcount = None
+    executed_query = None
+    query_result = ''
+    try:
+        # COPY does not accept query parameters,
+        # so substitute them on the client side.
+        # A trailing semicolon is not allowed inside COPY (...)
+        executed_query = cursor.mogrify(query.rstrip().rstrip(';').rstrip(), args)
+        buf = io.BytesIO()
+        cursor.copy_expert(b'COPY (' + executed_query + b') TO STDOUT WITH CSV HEADER', buf)
+        statusmessage = cursor.statusmessage
+        rowcount = cursor.rowcount
+        query_result = to_text(buf.getvalue())
+
+    except Exception as e:
+        module.fail_json(msg='Cannot export rows of query "%s": %s' % (query, to_native(e)))
+
+    return statusmessage, rowcount, executed_query, query_result
 
 
 def main():
@@ -280,13 +636,17 @@ def main():
         query=dict(type='str'),
         positional_args=dict(type='list', elements='raw'),
         named_args=dict(type='dict'),
+        batch_args=dict(type='list', elements='raw'),
         rows_type=dict(type='str', choices=['dict', 'tuple'], default='dict'),
+        output_format=dict(type='str', choices=['rows', 'csv'], default='rows'),
+        cache_ttl=dict(type='int', default=0),
+        return_mogrified=dict(type='bool', default=True),
     )
 
     # Instantiate an object of module class
     module = AnsibleModule(
         argument_spec=argument_spec,
-        mutually_exclusive=(('positional_args', 'named_args'),),
+        mutually_exclusive=(('positional_args', 'named_args', 'batch_args'),),
         supports_check_mode=False,
     )
 
@@ -294,7 +654,32 @@ def main():
     query = module.params['query']
     positional_args = module.params['positional_args']
     named_args = module.params['named_args']
+    batch_args = module.params['batch_args']
     rows_type = module.params['rows_type']
+    output_format = module.params['output_format']
+    cache_ttl = module.params['cache_ttl']
+    return_mogrified = module.params['return_mogrified']
+
+    if output_format == 'csv' and batch_args is not None:
+        module.fail_json(msg='output_format=csv cannot be used with batch_args')
+
+    conn_params = get_conn_params(module.params)
+
+    # Prepare args:
+    if batch_args is not None:
+        args = batch_args
+    else:
+        args = get_args(positional_args, named_args)
+
+    # Return the cached result if there's a valid one
+    cache_path = None
+    if cache_ttl > 0 and batch_args is None and query and query.strip().upper().startswith('SELECT'):
+        cache_path = get_cache_path(query, args, conn_params, rows_type, output_format)
+        cached = read_cache(cache_path, cache_ttl)
+        if cached is not None:
+            if not return_mogrified:
+                cached['query'] = query
+            module.exit_json(changed=True, **cached)
 
     # Connect to DB, get cursor
     cockroachdb = CockroachDBServer(module)
@@ -304,20 +689,26 @@ def main():
     else:
         fetch_from_cursor = fetch_from_cursor_tuple
 
-    conn = cockroachdb.connect(conn_params=get_conn_params(module.params),
+    conn = cockroachdb.connect(conn_params=conn_params,
                                autocommit=True, rows_type=rows_type)
-    cursor = conn.cursor()
-
-    # Prepare args:
-    args = get_args(positional_args, named_args)
-
-    # Execute query
-    statusmsg, rowcount, query, query_result = execute(module, cursor, query,
-                                                       args, fetch_from_cursor)
 
-    # Close cursor and conn
-    cursor.close()
-    conn.close()
+    # Execute query. The cursor is closed and conn
+    # is returned to the pool even if the module fails
+    try:
+        with closing(conn.cursor()) as cursor:
+            if output_format == 'csv':
+                statusmsg, rowcount, executed_query, query_result = execute_copy(module, cursor, query, args)
+            else:
+                statusmsg, rowcount, executed_query, query_result = execute(module, cursor, query,
+                                                                            args, fetch_from_cursor,
+                                                                            batch=batch_args is not None)
+    finally:
+        cockroachdb.close()
+
+    # Return the query with substituted arguments unless
+    # a user wants it as it was passed, e.g. when the arguments are large
+    if return_mogrified:
+        query = executed_query
 
     # Users will get this in JSON output after execution
     kw = dict(
@@ -328,6 +719,14 @@ def main():
         query=query,
     )
 
+    if cache_path:
+        write_cache(module, cache_path, dict(
+            statusmessage=statusmsg,
+            rowcount=rowcount,
+            query_result=query_result,
+            query=to_text(executed_query),
+        ))
+
     module.exit_json(**kw)
 
 
@@ -5,10 +5,13 @@ __metaclass__ = type
 
 import pytest
 
+from ansible_collections.community.cockroachdb.plugins.module_utils import cockroachdb
 from ansible_collections.community.cockroachdb.plugins.module_utils.cockroachdb import (
+    CockroachDBServer,
     common_argument_spec,
     get_conn_params,
     get_params_map,
+    get_pool_key,
 )
 
 
@@ -134,3 +137,122 @@ def test_get_params_map():
 )
 def test_get_conn_params(input_, expected):
     assert get_conn_params(input_) == expected
+
+
+def test_get_pool_key():
+    # The key must not depend on the order of connection parameters
+    # and must differ for different rows types
+    conn_params = {'host': 'localhost', 'user': 'root', 'sslmode': 'verify-full'}
+    reordered = {'sslmode': 'verify-full', 'user': 'root', 'host': 'localhost'}
+
+    assert get_pool_key(conn_params, 'dict') == get_pool_key(reordered, 'dict')
+    assert get_pool_key(conn_params, 'dict') != get_pool_key(conn_params, 'tuple')
+    assert get_pool_key(conn_params, 'dict') == (
+        'dict', ('host', 'localhost'), ('sslmode', 'verify-full'), ('user', 'root'),
+    )
+
+
+# Installing and importing psycopg2 would be an extra thing here,
+# so I'll use dummy classes for the pool and its connections
+class Connection():
+    def __init__(self):
+        self.autocommit = None
+
+    def set_session(self, autocommit):
+        self.autocommit = autocommit
+
+
+class ThreadedConnectionPool():
+    instances = []
+
+    def __init__(self, minconn, maxconn, cursor_factory=None, **conn_params):
+        self.conn_params = conn_params
+        self.cursor_factory = cursor_factory
+        self.returned = []
+        self.closed = False
+        ThreadedConnectionPool.instances.append(self)
+
+    def getconn(self):
+        return Connection()
+
+    def putconn(self, conn):
+        self.returned.append(conn)
+
+    def closeall(self):
+        self.closed = True
+
+
+class Psycopg2():
+    __version__ = '2.9.3'
+
+
+class Module():
+    def fail_json(self, msg):
+        pytest.fail(msg)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(cockroachdb, 'HAS_PSYCOPG2', True)
+    monkeypatch.setattr(cockroachdb, 'psycopg2', Psycopg2)
+    monkeypatch.setattr(cockroachdb, 'DictCursor', 'DictCursor', raising=False)
+    monkeypatch.setattr(cockroachdb, 'ThreadedConnectionPool', ThreadedConnectionPool, raising=False)
+    monkeypatch.setattr(cockroachdb, '_POOLS', {})
+    monkeypatch.setattr(ThreadedConnectionPool, 'instances', [])
+    return CockroachDBServer(Module())
+
+
+def test_connect_reuses_pool(server):
+    conn_params = {'host': 'localhost', 'user': 'root'}
+
+    first = server.connect(conn_params, autocommit=True)
+    server.close()
+    second = server.connect({'user': 'root', 'host': 'localhost'}, autocommit=False)
+
+    # The same connection parameters and rows type share a pool
+    assert len(ThreadedConnectionPool.instances) == 1
+    pool = ThreadedConnectionPool.instances[0]
+    assert pool.conn_params == dict(conn_params, application_name='ansible-community.cockroachdb')
+    assert pool.cursor_factory == 'DictCursor'
+    # The session characteristics are set on every checkout
+    assert first.autocommit is True
+    assert second.autocommit is False
+
+
+def test_connect_different_rows_type(server):
+    conn_params = {'host': 'localhost', 'user': 'root'}
+
+    server.connect(conn_params, rows_type='dict')
+    server.connect(conn_params, rows_type='tuple')
+
+    assert len(ThreadedConnectionPool.instances) == 2
+    assert ThreadedConnectionPool.instances[1].cursor_factory is None
+
+
+def test_close(server):
+    conn = server.connect({'host': 'localhost'})
+    server.close()
+
+    assert ThreadedConnectionPool.instances[0].returned == [conn]
+    assert server.connection is None
+
+    # Closing again does nothing
+    server.close()
+    assert ThreadedConnectionPool.instances[0].returned == [conn]
+
+
+def test_connect_application_name(server):
+    # The application name passed by a caller is kept
+    server.connect({'host': 'localhost', 'application_name': 'test'})
+
+    assert ThreadedConnectionPool.instances[0].conn_params == {'host': 'localhost', 'application_name': 'test'}
+
+
+def test_close_pools(server):
+    server.connect({'host': 'localhost'}, rows_type='dict')
+    server.connect({'host': 'localhost'}, rows_type='tuple')
+
+    cockroachdb.close_pools()
+
+    assert [pool.closed for pool in ThreadedConnectionPool.instances] == [True, True]
+    assert cockroachdb._POOLS == {}
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.community.cockroachdb.plugins.modules.cockroachdb_db import (
+    CockroachDBDatabase,
+)
+
+
+class Cursor():
+    """Fake cursor class"""
+    def __init__(self, row):
+        # The row returned when fetching the database info
+        self.row = row
+        self.executed = []
+
+    def execute(self, query, args=None):
+        self.executed.append((query, args))
+
+    def fetchone(self):
+        return self.row
+
+
+class Module():
+    """Fake module class"""
+    def __init__(self, check_mode=False, owner=None):
+        self.check_mode = check_mode
+        self.params = {'owner': owner}
+
+
+DB_ROW = {
+    'owner': 'root',
+    'primary_region': None,
+    'regions': [],
+    'survival_goal': None,
+}
+
+
+@pytest.mark.parametrize('row,exists,owner', [
+    (DB_ROW, True, 'root'),
+    (None, False, None),
+])
+def test_fetch_info(row, exists, owner):
+    cursor = Cursor(row)
+    database = CockroachDBDatabase(Module(), cursor, 'test_db')
+
+    # Only the row of the database is requested from the server
+    assert cursor.executed == [(
+        'SELECT owner, primary_region, regions, survival_goal '
+        'FROM [SHOW DATABASES] WHERE database_name = %s',
+        ('test_db',),
+    )]
+    assert database.exists is exists
+    assert database.owner == owner
+
+
+@pytest.fixture
+def quote_ident(monkeypatch):
+    # psycopg2 quotes identifiers using the connection,
+    # so replace it with the same quoting libpq does
+    sql = pytest.importorskip('psycopg2.sql')
+    monkeypatch.setattr(sql.ext, 'quote_ident',
+                        lambda s, context: '"%s"' % s.replace('"', '""'))
+
+
+@pytest.mark.parametrize('owner,expected', [
+    (None, 'CREATE DATABASE "test_db"'),
+    ('root', 'CREATE DATABASE "test_db" OWNER "root"'),
+    ('Root', 'CREATE DATABASE "test_db" OWNER "root"'),
+])
+def test_create(quote_ident, owner, expected):
+    cursor = Cursor(None)
+    database = CockroachDBDatabase(Module(owner=owner), cursor, 'test_db')
+    database.create()
+
+    assert cursor.executed[-1] == (expected, None)
+    assert database.executed_statements == [(expected, ())]
+
+
+def test_drop(quote_ident):
+    cursor = Cursor(DB_ROW)
+    database = CockroachDBDatabase(Module(), cursor, 'test_db')
+    database.drop()
+
+    assert database.executed_statements == [('DROP DATABASE "test_db"', ())]
+
+
+def test_change_owner(quote_ident):
+    cursor = Cursor(DB_ROW)
+    database = CockroachDBDatabase(Module(), cursor, 'test"db')
+
+    assert database.modify('Admin', None) is True
+    assert database.executed_statements == [('ALTER DATABASE "test""db" OWNER TO "admin"', ())]
+
+
+@pytest.mark.parametrize('owner', ['root', 'ROOT', None])
+@pytest.mark.parametrize('check_mode', [False, True])
+def test_modify_same_owner(owner, check_mode):
+    # Nothing is executed when the database is already owned by the user
+    cursor = Cursor(DB_ROW)
+    database = CockroachDBDatabase(Module(check_mode=check_mode), cursor, 'test_db')
+
+    assert database.modify(owner, None) is False
+    assert len(cursor.executed) == 1
+    assert database.executed_statements == []
+
+
+def test_change_owner_check_mode():
+    cursor = Cursor(DB_ROW)
+    database = CockroachDBDatabase(Module(check_mode=True), cursor, 'test_db')
+
+    assert database.modify('admin', None) is True
+    assert len(cursor.executed) == 1
+    assert database.executed_statements == []
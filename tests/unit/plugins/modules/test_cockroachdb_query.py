@@ -3,17 +3,28 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
-from datetime import timedelta
+import os
+
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
 import pytest
 
+from ansible_collections.community.cockroachdb.plugins.modules import cockroachdb_query
 from ansible_collections.community.cockroachdb.plugins.modules.cockroachdb_query import (
+    EXECUTE_PAGE_SIZE,
+    OIDS_NEED_TO_CONVERT,
     convert_to_supported,
     execute,
+    execute_copy,
     fetch_from_cursor_dict,
     fetch_from_cursor_tuple,
     get_args,
+    get_cache_path,
+    get_positions_to_convert,
+    get_row_converter,
+    read_cache,
+    write_cache,
 )
 
 
@@ -44,95 +55,156 @@ def test_convert_to_supported(input_, expected):
     assert convert_to_supported(input_) == expected
 
 
-@pytest.mark.parametrize('input_, expected', [
-    ([('first value', timedelta(0, 43200))], [('first value', '12:00:00')]),
-    ([(1, Decimal('1.01'))], [(1, 1.01)]),
-    ([('string',)], [('string',)]),
-    ([(None,)], [(None,)]),
-    ([(1,), (2,), (1, Decimal('1.01'))], [(1,), (2,), (1, 1.01)]),
-    ([(1,), (2,)], [(1,), (2,)]),
+# Type OIDs used in fake cursor descriptions
+INT8 = 20
+TEXT = 25
+INTERVAL = 1186
+NUMERIC = 1700
+
+
+class Column():
+    """Fake column of cursor.description"""
+    def __init__(self, name, type_code):
+        self.name = name
+        self.type_code = type_code
+
+
+class Cursor():
+    """Fake cursor class"""
+    # These are fake results that the cursor will
+    # return when fetching rows from it
+    def __init__(self, columns, sequence):
+        self.description = [Column(name, type_code) for name, type_code in columns]
+        self.sequence = list(sequence)
+        # Just fillers
+        self.statusmessage = 'blahblah'
+        self.rowcount = len(self.sequence)
+        self.query = None
+        self.args = None
+
+    def execute(self, query, args):
+        self.query = query
+        self.args = args
+
+    def fetchall(self):
+        rows, self.sequence = self.sequence, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+def test_oids_need_to_convert():
+    # The OIDs are taken from the psycopg2 typecasters
+    # returning decimal.Decimal and datetime.timedelta
+    assert OIDS_NEED_TO_CONVERT == frozenset((1700, 704, 1186))
+
+
+@pytest.mark.parametrize('columns,expected', [
+    ([('id', INT8), ('story', TEXT)], []),
+    ([('dec', NUMERIC), ('ti', INTERVAL)], [0, 1]),
+    ([('id', INT8), ('dec', NUMERIC)], [1]),
+    ([], []),
 ])
-def test_fetch_from_cursor_tuple(input_, expected):
+def test_get_positions_to_convert(columns, expected):
+    # Only values of columns of types which are
+    # not supported by Ansible engine need conversion
+    assert get_positions_to_convert(Cursor(columns, [])) == expected
+
+
+def test_get_positions_to_convert_no_description():
+    # cursor.description is None when a query returns no rows,
+    # for example INSERT without RETURNING
+    cursor = Cursor([], [])
+    cursor.description = None
+    assert get_positions_to_convert(cursor) == []
+
+
+@pytest.mark.parametrize('positions,input_,expected', [
+    ([1], (1, Decimal('1.01'), 'string'), [1, 1.01, 'string']),
+    ([0, 2], (Decimal('1.01'), 'string', timedelta(0, 43200)), [1.01, 'string', '12:00:00']),
+    ([0], (None, 1), [None, 1]),
+    ([], (1, 'string'), [1, 'string']),
+])
+def test_get_row_converter(positions, input_, expected):
+    # Only values at the passed positions are converted
+    assert get_row_converter(positions)(input_) == expected
+
+
+@pytest.mark.parametrize('columns,input_,expected', [
+    ([('1', TEXT), ('2', INTERVAL)], [('first value', timedelta(0, 43200))], [('first value', '12:00:00')]),
+    ([('1', INT8), ('2', NUMERIC)], [(1, Decimal('1.01'))], [(1, 1.01)]),
+    ([('1', NUMERIC)], [(None,)], [(None,)]),
+    ([('1', TEXT)], [('string',)], [('string',)]),
+    ([('1', TEXT)], [(None,)], [(None,)]),
+    ([('1', INT8), ('2', NUMERIC)], [(1, None), (2, None), (1, Decimal('1.01'))], [(1, None), (2, None), (1, 1.01)]),
+    ([('1', INT8)], [(1,), (2,)], [(1,), (2,)]),
+])
+def test_fetch_from_cursor_tuple(columns, input_, expected):
     # fetch_from_cursor_tuple function requires an argument
-    # of psycopg2 cursor class. In the context
-    # of the function, it works as iterator, so we're
-    # passing lists as input_. It invokes cover_to_support
+    # of psycopg2 cursor class, so we're passing a fake cursor
+    # returning input_. It invokes cover_to_support
     # function covered above to convert elements
     # of not supported types to appropriate ones.
-    assert fetch_from_cursor_tuple(input_) == expected
+    assert fetch_from_cursor_tuple(Cursor(columns, input_)) == expected
 
 
-@pytest.mark.parametrize('input_, expected', [
-    ([{1: 'first value', 2: timedelta(0, 43200)}], [{1: 'first value', 2: '12:00:00'}]),
-    ([{1: 1, 2: Decimal('1.01')}], [{1: 1, 2: 1.01}]),
-    ([{1: 'string'}], [{1: 'string'}]),
-    ([{1: None}], [{1: None}]),
-    ([{1: 1}, {2: 2}, {1: 1, 2: Decimal('1.01')}], [{1: 1}, {2: 2}, {1: 1, 2: 1.01}]),
-    ([{1: 1}, {2: 2}], [{1: 1}, {2: 2}]),
+def test_fetch_from_cursor_tuple_nothing_to_convert():
+    # When no column needs conversion,
+    # the rows are returned as cursor.fetchall() returns them
+    sequence = [(1, 'string'), (2, None)]
+    cursor = Cursor([('id', INT8), ('story', TEXT)], sequence)
+    assert fetch_from_cursor_tuple(cursor) == sequence
+
+
+@pytest.mark.parametrize('columns,input_,expected', [
+    ([('1', TEXT), ('2', INTERVAL)], [('first value', timedelta(0, 43200))], [{'1': 'first value', '2': '12:00:00'}]),
+    ([('1', INT8), ('2', NUMERIC)], [(1, Decimal('1.01'))], [{'1': 1, '2': 1.01}]),
+    ([('1', NUMERIC)], [(None,)], [{'1': None}]),
+    ([('1', TEXT)], [('string',)], [{'1': 'string'}]),
+    ([('1', TEXT)], [(None,)], [{'1': None}]),
+    ([('1', INT8), ('2', NUMERIC)], [(1, None), (2, None), (1, Decimal('1.01'))], [{'1': 1, '2': None}, {'1': 2, '2': None}, {'1': 1, '2': 1.01}]),
+    ([('1', INT8)], [(1,), (2,)], [{'1': 1}, {'1': 2}]),
 ])
-def test_fetch_from_cursor_dict(input_, expected):
+def test_fetch_from_cursor_dict(columns, input_, expected):
     # fetch_from_cursor_dict function requires an argument
-    # of psycopg2 cursor class. In the context
-    # of the function, it works as iterator, so we're
-    # passing lists as input_. It invokes cover_to_support
-    # function covered above to convert elements
-    # of not supported types to appropriate ones.
-    assert fetch_from_cursor_dict(input_) == expected
-
-
-@pytest.mark.parametrize('sequence,expected,fetch_func', [
-    ([('first value', timedelta(0, 43200))], [('first value', '12:00:00')], fetch_from_cursor_tuple),
-    ([(1, Decimal('1.01'))], [(1, 1.01)], fetch_from_cursor_tuple),
-    ([('string',)], [('string',)], fetch_from_cursor_tuple),
-    ([(None,)], [(None,)], fetch_from_cursor_tuple),
-    ([(1,), (2,), (1, Decimal('1.01'))], [(1,), (2,), (1, 1.01)], fetch_from_cursor_tuple),
-    ([(1,), (2,)], [(1,), (2,)], fetch_from_cursor_tuple),
-    ([{1: 'first value', 2: timedelta(0, 43200)}], [{1: 'first value', 2: '12:00:00'}], fetch_from_cursor_dict),
-    ([{1: 1, 2: Decimal('1.01')}], [{1: 1, 2: 1.01}], fetch_from_cursor_dict),
-    ([{1: 'string'}], [{1: 'string'}], fetch_from_cursor_dict),
-    ([{1: None}], [{1: None}], fetch_from_cursor_dict),
-    ([{1: 1}, {2: 2}, {1: 1, 2: Decimal('1.01')}], [{1: 1}, {2: 2}, {1: 1, 2: 1.01}], fetch_from_cursor_dict),
-    ([{1: 1}, {2: 2}], [{1: 1}, {2: 2}], fetch_from_cursor_dict),
+    # of psycopg2 cursor class, so we're passing a fake cursor
+    # returning input_ (DictCursor rows are sequences as well).
+    # It invokes cover_to_support function covered above
+    # to convert elements of not supported types to appropriate ones.
+    assert fetch_from_cursor_dict(Cursor(columns, input_)) == expected
+
+
+@pytest.mark.parametrize('columns,sequence,expected,fetch_func', [
+    ([('1', TEXT), ('2', INTERVAL)], [('first value', timedelta(0, 43200))], [('first value', '12:00:00')], fetch_from_cursor_tuple),
+    ([('1', INT8), ('2', NUMERIC)], [(1, Decimal('1.01'))], [(1, 1.01)], fetch_from_cursor_tuple),
+    ([('1', TEXT)], [('string',)], [('string',)], fetch_from_cursor_tuple),
+    ([('1', TEXT)], [(None,)], [(None,)], fetch_from_cursor_tuple),
+    ([('1', INT8), ('2', NUMERIC)], [(1, None), (2, None), (1, Decimal('1.01'))], [(1, None), (2, None), (1, 1.01)], fetch_from_cursor_tuple),
+    ([('1', INT8)], [(1,), (2,)], [(1,), (2,)], fetch_from_cursor_tuple),
+    ([('1', TEXT), ('2', INTERVAL)], [('first value', timedelta(0, 43200))], [{'1': 'first value', '2': '12:00:00'}], fetch_from_cursor_dict),
+    ([('1', INT8), ('2', NUMERIC)], [(1, Decimal('1.01'))], [{'1': 1, '2': 1.01}], fetch_from_cursor_dict),
+    ([('1', TEXT)], [('string',)], [{'1': 'string'}], fetch_from_cursor_dict),
+    ([('1', TEXT)], [(None,)], [{'1': None}], fetch_from_cursor_dict),
+    ([('1', INT8), ('2', NUMERIC)], [(1, None), (2, None), (1, Decimal('1.01'))],
+     [{'1': 1, '2': None}, {'1': 2, '2': None}, {'1': 1, '2': 1.01}], fetch_from_cursor_dict),
+    ([('1', INT8)], [(1,), (2,)], [{'1': 1}, {'1': 2}], fetch_from_cursor_dict),
 ])
-def test_execute(sequence, expected, fetch_func):
+def test_execute(columns, sequence, expected, fetch_func):
     # The execute function invokes a passed fetch_from_cursor function
     # that, in turn, invokes the convert_to_supported function
     # to handle fetched from cursor elements when deeded.
     # So we expect that unsupported elements will be converted,
     # for example those timedelta and Decimal values in
     # @pytest.mark.parametrize arguments
-    class Cursor():
-        """Fake cursor class"""
-        # These are fake results that the cursor will
-        # return when iterating through it
-        def __init__(self, sequence):
-            # Just fillers
-            self.sequence = sequence
-            self.statusmessage = 'blahblah'
-            self.rowcount = len(self.sequence)
-            self.query = None
-            self.args = None
-
-        def execute(self, query, args):
-            self.query = query
-            self.args = args
-
-        def mogrify(self, query, args):
-            return query, args
-
-        def __iter__(self):
-            for item in self.sequence:
-                yield item
-
     class Module():
         """Fake module class"""
         def fail_json(self, msg=None):
-            # For debugging. Also comment out PsycopgProgrammingError
-            # exception in the module's file
+            # For debugging
             print(msg)
 
     module = Module()
-    cursor = Cursor(sequence)
+    cursor = Cursor(columns, sequence)
     query = 'SELECT 1'
     args = (1, 2, 3)
 
@@ -146,4 +218,240 @@ def test_execute(sequence, expected, fetch_func):
     assert res == expected
     assert cursor.query == 'SELECT 1'
     assert cursor.args == (1, 2, 3)
-    assert query == ('SELECT 1', (1, 2, 3))
+    assert query == cursor.query
+
+
+def test_execute_batch(monkeypatch):
+    # With batch=True, the execute function passes all the args
+    # to psycopg2.extras.execute_batch instead of cursor.execute
+    calls = []
+
+    def fake_execute_batch(cursor, query, args_list, page_size):
+        calls.append((query, args_list, page_size))
+        cursor.rowcount = 1
+        cursor.statusmessage = 'INSERT 0 1'
+        cursor.description = None
+
+    monkeypatch.setattr(cockroachdb_query, 'execute_batch', fake_execute_batch, raising=False)
+
+    class Module():
+        """Fake module class"""
+        def fail_json(self, msg=None):
+            print(msg)
+
+    # The cursor must not be used for executing
+    monkeypatch.setattr(Cursor, 'execute', lambda self, q, a: pytest.fail('cursor.execute() called'))
+    cursor = Cursor([], [])
+    query = 'INSERT INTO test (id, story) VALUES (%s, %s)'
+    args = [[1, 'first'], [2, 'second']]
+
+    # There's nothing to fetch after INSERT
+    # as execute_batch sets cursor.description to None
+    statusmessage, rowcount, executed_query, res = execute(Module(), cursor, query, args,
+                                                           lambda cursor: pytest.fail('rows fetched'),
+                                                           batch=True)
+
+    assert calls == [(query, args, EXECUTE_PAGE_SIZE)]
+    assert statusmessage == 'INSERT 0 1'
+    assert rowcount == 1
+    assert executed_query == query
+    assert res == []
+
+
+def test_execute_no_description():
+    # cursor.description is None for queries that
+    # return no rows like INSERT without RETURNING,
+    # so no rows are fetched from the cursor
+    class Module():
+        """Fake module class"""
+        def fail_json(self, msg=None):
+            pytest.fail(msg)
+
+    cursor = Cursor([], [])
+    cursor.description = None
+
+    statusmessage, rowcount, query, res = execute(Module(), cursor, 'INSERT INTO test VALUES (1)', None,
+                                                  lambda cursor: pytest.fail('rows fetched'))
+
+    assert statusmessage == 'blahblah'
+    assert res == []
+
+
+def test_get_cache_path():
+    # The path must change when anything the result depends on changes
+    conn_params = {'host': 'localhost', 'user': 'root'}
+    path = get_cache_path('SELECT %s', [1], conn_params, 'dict')
+
+    assert path == get_cache_path('  SELECT %s\n', [1], {'user': 'root', 'host': 'localhost'}, 'dict')
+    assert path != get_cache_path('SELECT %s', [2], conn_params, 'dict')
+    assert path != get_cache_path('SELECT %s', [1], {'host': 'otherhost', 'user': 'root'}, 'dict')
+    assert path != get_cache_path('SELECT %s', [1], conn_params, 'tuple')
+    assert path != get_cache_path('SELECT %s', [1], conn_params, 'dict', 'csv')
+    # Whitespace inside the query can be significant
+    assert get_cache_path("SELECT 'a  b'", None, conn_params, 'dict') != get_cache_path("SELECT 'a b'", None, conn_params, 'dict')
+
+
+class CacheModule():
+    """Fake module class"""
+    def __init__(self):
+        self.warnings = []
+
+    def warn(self, msg):
+        self.warnings.append(msg)
+
+
+def test_write_read_cache(tmp_path):
+    module = CacheModule()
+    path = str(tmp_path / 'cache' / 'key')
+    result = {'statusmessage': 'SELECT 1', 'rowcount': 1, 'query_result': [{'id': 1}], 'query': 'SELECT 1'}
+
+    assert read_cache(path, 60) is None
+
+    write_cache(module, path, result)
+
+    assert module.warnings == []
+    assert read_cache(path, 60) == result
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+
+
+def test_write_cache_dates(tmp_path):
+    # Dates are cached the way the module returns them
+    module = CacheModule()
+    path = str(tmp_path / 'cache' / 'key')
+    result = {'query_result': [{'d': date(2021, 11, 8), 'dt': datetime(2021, 11, 8, 12, 30)}]}
+
+    write_cache(module, path, result)
+
+    assert read_cache(path, 60) == {'query_result': [{'d': '2021-11-08', 'dt': '2021-11-08T12:30:00'}]}
+
+
+def test_read_cache_expired(tmp_path):
+    module = CacheModule()
+    path = str(tmp_path / 'cache' / 'key')
+    write_cache(module, path, {'rowcount': 1})
+
+    # Make the cached result older than the TTL
+    os.utime(path, (0, 0))
+
+    assert read_cache(path, 60) is None
+    # The expired result is removed
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize('content', ['[1, 2]', '"string"', 'null', '{"rowcount": 1'])
+def test_read_cache_invalid(tmp_path, content):
+    # Files which do not contain a result are not used
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir(mode=0o700)
+    path = cache_dir / 'key'
+    path.write_text(content)
+
+    assert read_cache(str(path), 60) is None
+
+
+def test_write_cache_existing_dir(tmp_path):
+    # The directory may already exist, e.g. created by another module invocation
+    module = CacheModule()
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir(mode=0o700)
+    path = str(cache_dir / 'key')
+
+    write_cache(module, path, {'rowcount': 1})
+
+    assert module.warnings == []
+    assert read_cache(path, 60) == {'rowcount': 1}
+
+
+def test_write_cache_prune(tmp_path, monkeypatch):
+    # Only CACHE_MAX_ENTRIES most recent results are kept
+    monkeypatch.setattr(cockroachdb_query, 'CACHE_MAX_ENTRIES', 2)
+    module = CacheModule()
+    cache_dir = tmp_path / 'cache'
+
+    for i, name in enumerate(('old', 'middle')):
+        write_cache(module, str(cache_dir / name), {'rowcount': i})
+        os.utime(str(cache_dir / name), (i, i))
+
+    # Temporary files of other module invocations are not touched
+    (cache_dir / '.tmpabc').write_text(u'')
+    os.utime(str(cache_dir / '.tmpabc'), (0, 0))
+
+    write_cache(module, str(cache_dir / 'new'), {'rowcount': 2})
+
+    assert module.warnings == []
+    assert sorted(os.listdir(str(cache_dir))) == ['.tmpabc', 'middle', 'new']
+
+
+def test_write_cache_not_serializable(tmp_path):
+    # Results which cannot be serialized are not cached
+    module = CacheModule()
+    cache_dir = tmp_path / 'cache'
+    path = str(cache_dir / 'key')
+
+    write_cache(module, path, {'query_result': [{'obj': object()}]})
+
+    assert os.listdir(str(cache_dir)) == []
+    assert module.warnings == ['Cannot cache query result: Object of type object is not JSON serializable']
+
+
+def test_write_cache_not_private_dir(tmp_path):
+    # Results must not be cached in a directory other users can access
+    module = CacheModule()
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    cache_dir.chmod(0o777)
+    path = str(cache_dir / 'key')
+
+    write_cache(module, path, {'rowcount': 1})
+
+    assert not os.path.exists(path)
+    assert module.warnings == ['Cannot cache query result: %s is accessible to other users' % cache_dir]
+
+
+class CopyCursor():
+    """Fake cursor class supporting COPY"""
+    def __init__(self):
+        self.statusmessage = None
+        self.rowcount = None
+        self.sql = None
+
+    def mogrify(self, query, args):
+        return (query % args).encode('utf-8')
+
+    def copy_expert(self, sql, file):
+        self.sql = sql
+        file.write(b'id,story\n1,hello\n')
+        self.statusmessage = 'COPY 1'
+        self.rowcount = 1
+
+
+class CopyModule():
+    """Fake module class"""
+    def fail_json(self, msg=None):
+        pytest.fail(msg)
+
+
+def test_execute_copy():
+    # The query with substituted arguments is wrapped
+    # in COPY and the CSV written by the server is returned as text
+    cursor = CopyCursor()
+    statusmessage, rowcount, query, res = execute_copy(CopyModule(), cursor, 'SELECT * FROM test WHERE id = %s', (1,))
+
+    assert cursor.sql == b'COPY (SELECT * FROM test WHERE id = 1) TO STDOUT WITH CSV HEADER'
+    assert statusmessage == 'COPY 1'
+    assert rowcount == 1
+    assert query == b'SELECT * FROM test WHERE id = 1'
+    assert res == 'id,story\n1,hello\n'
+
+
+@pytest.mark.parametrize('query', [
+    'SELECT * FROM test WHERE id = %s;',
+    'SELECT * FROM test WHERE id = %s ; \n',
+])
+def test_execute_copy_trailing_semicolon(query):
+    # A trailing semicolon would be a syntax error inside COPY (...)
+    cursor = CopyCursor()
+    dummy, dummy, executed_query, dummy = execute_copy(CopyModule(), cursor, query, (1,))
+
+    assert cursor.sql == b'COPY (SELECT * FROM test WHERE id = 1) TO STDOUT WITH CSV HEADER'
+    assert executed_query == b'SELECT * FROM test WHERE id = 1'